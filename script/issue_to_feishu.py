@@ -1,15 +1,109 @@
 #!/usr/bin/env python3
-"""Sync GitHub issue events to Feishu Bitable."""
+"""Sync GitHub issue events to Feishu Bitable.
+
+Events are read from GITHUB_EVENT_PATH, from every JSON file in
+GITHUB_EVENTS_DIR, or, as a long-running consumer, one JSON document per line
+from GITHUB_EVENTS_STREAM ("-" for stdin).
+
+FEISHU_RECORD_CACHE names a JSON file that remembers, per table, the record_id
+of every synced issue, so later runs update those rows without a search. The
+issue workflows restore it from the Actions cache and save it under a new key
+per run. Runs that start together restore the same copy, and the one saved last
+is what the next run restores, so the record IDs learned by the other are lost
+and those issues cost one more search. A remembered record_id whose row was
+deleted is looked up again, so a stale cache does not break a sync.
+
+FEISHU_SKIP_UNCHANGED=1 also skips issues whose content matches the last write
+recorded in that file. Leave it off when anything else writes to the table,
+e.g. the two issue workflows, which fill different fields of the same rows.
+"""
 
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import sys
-from datetime import datetime, timezone
-from typing import Any
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Iterator, TypedDict
+from urllib.parse import urlencode, urlsplit
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from http.client import HTTPConnection
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the workflows run on a bare python3
+    orjson = None
+
+# Refresh the cached tenant token this many seconds before Feishu expires it.
+TOKEN_EXPIRY_MARGIN = 60
+# Tokens already obtained by this process, keyed by app_id, as (token, expires_at).
+_TOKENS: dict[str, tuple[str, float]] = {}
+
+# Idle keep-alive connections keyed by (scheme, netloc), so calls after the
+# first ones skip the TCP and TLS handshakes.
+_IDLE_CONNECTIONS: dict[tuple[str, str], list[HTTPConnection]] = {}
+_CONNECTIONS_LOCK = threading.Lock()
+
+# Independent Feishu requests run on a few worker threads; kept small to stay
+# well inside the Open API rate limits.
+MAX_CONCURRENT_REQUESTS = 4
+_EXECUTOR: ThreadPoolExecutor | None = None
+
+# http.client (which pulls in ssl and email) and concurrent.futures are imported
+# on first use. Only runs that exit on missing environment variables skip them:
+# the token fetch is submitted before any event is read, so it overlaps event
+# parsing, and the first HTTP import happens on its worker thread.
+
+TOKEN_URL = "{base_url}/open-apis/auth/v3/tenant_access_token/internal"
+RECORDS_URL = "{base_url}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records"
+_JSON_HEADERS = {"Content-Type": "application/json; charset=utf-8"}
+
+# Bitable accepts at most 500 records per batch write and per search page.
+BATCH_SIZE = 500
+# Issue IDs looked up per search request, each one being a filter condition.
+SEARCH_BATCH_SIZE = 50
+# Bitable error code for a record_id that no longer exists in the table.
+RECORD_ID_NOT_FOUND = 1254043
+
+
+class IssueFields(TypedDict, total=False):
+    """The part of a GitHub issue payload that is synced to Bitable."""
+
+    id: int
+    number: int
+    title: str
+    state: str
+    html_url: str
+    labels: list[dict[str, Any]]
+    created_at: str
+    updated_at: str
+    closed_at: str | None
+
+
+# Runtime types of the IssueFields keys; values of any other type are dropped
+# so a malformed payload degrades to empty cells instead of failing the sync.
+ISSUE_KEY_TYPES: dict[str, type] = {
+    "id": int,
+    "number": int,
+    "title": str,
+    "state": str,
+    "html_url": str,
+    "labels": list,
+    "created_at": str,
+    "updated_at": str,
+    "closed_at": str,
+}
 
 
 def _env(name: str, default: str | None = None) -> str:
@@ -19,186 +113,589 @@ def _env(name: str, default: str | None = None) -> str:
     return value
 
 
+@lru_cache(maxsize=1024)
 def _parse_github_timestamp(value: str | None) -> int | None:
     if not value:
         return None
-    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    # GitHub timestamps always carry an offset, so the parsed datetime is aware
+    # and needs no timezone conversion before taking the epoch.
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
     # Feishu datetime fields expect a unix timestamp in milliseconds.
-    return int(parsed.astimezone(timezone.utc).timestamp() * 1000)
+    return int(parsed.timestamp() * 1000)
+
+
+def _json_dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _extract_issue(event: Any, source: str) -> IssueFields:
+    issue = event.get("issue") if isinstance(event, dict) else None
+    if not isinstance(issue, dict):
+        raise SystemExit(f"Event payload missing 'issue': {source}")
+    # Keep only the synced keys so the rest of the payload (repository, sender,
+    # reactions, ...) can be freed right away, which matters in batched runs.
+    return {
+        key: issue[key]
+        for key, value_type in ISSUE_KEY_TYPES.items()
+        if isinstance(issue.get(key), value_type)
+    }
+
+
+def _load_issue(event_path: str) -> IssueFields:
+    with open(event_path, "rb") as handle:
+        return _extract_issue(_json_loads(handle.read()), event_path)
+
+
+def _event_paths() -> list[str]:
+    events_dir = os.getenv("GITHUB_EVENTS_DIR")
+    if not events_dir:
+        return [_env("GITHUB_EVENT_PATH")]
+    names = sorted(name for name in os.listdir(events_dir) if name.endswith(".json"))
+    if not names:
+        raise SystemExit(f"No event files found in {events_dir}")
+    return [os.path.join(events_dir, name) for name in names]
+
+
+def _stream_lines(stream_path: str) -> Iterator[tuple[int, bytes]]:
+    handle = sys.stdin.buffer if stream_path == "-" else open(stream_path, "rb")
+    with handle:
+        for line_number, line in enumerate(handle, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def _chunks(items: list[Any], size: int) -> list[list[Any]]:
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
 
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
 
-def _load_event(event_path: str) -> dict[str, Any]:
-    with open(event_path, "r", encoding="utf-8") as handle:
-        return json.load(handle)
+        _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+    return _EXECUTOR
+
+
+def _gather(calls: list[Callable[[], Any]]) -> list[Any]:
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    futures = [_executor().submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def _checkout_connection(scheme: str, netloc: str) -> HTTPConnection:
+    from http.client import HTTPConnection, HTTPSConnection
+
+    with _CONNECTIONS_LOCK:
+        idle = _IDLE_CONNECTIONS.get((scheme, netloc))
+        if idle:
+            return idle.pop()
+    connection_class = HTTPSConnection if scheme == "https" else HTTPConnection
+    return connection_class(netloc, timeout=30)
+
+
+def _checkin_connection(scheme: str, netloc: str, connection: HTTPConnection) -> None:
+    with _CONNECTIONS_LOCK:
+        _IDLE_CONNECTIONS.setdefault((scheme, netloc), []).append(connection)
 
 
 def _request_json(method: str, url: str, headers: dict[str, str], payload: Any) -> dict[str, Any]:
-    data = json.dumps(payload, ensure_ascii=True).encode("utf-8")
-    request = Request(url, data=data, headers=headers, method=method)
+    from http.client import RemoteDisconnected
+
+    data = _json_dumps(payload)
+    parts = urlsplit(url)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    connection = _checkout_connection(parts.scheme, parts.netloc)
+    while True:
+        reused = connection.sock is not None
+        try:
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            # The server may have dropped an idle keep-alive socket; retry once
+            # on a fresh connection. Timeouts and other errors are not retried,
+            # since Feishu may already have applied the request.
+            if reused:
+                continue
+            raise
+        except Exception:
+            connection.close()
+            raise
+        break
+    if response.will_close:
+        connection.close()
+    else:
+        _checkin_connection(parts.scheme, parts.netloc, connection)
+    if response.status >= 400:
+        # Feishu reports most API failures as a JSON body with a non-zero code;
+        # hand those back so callers can react to specific codes.
+        try:
+            error = _json_loads(body)
+        except ValueError:
+            error = None
+        if not isinstance(error, dict) or not error.get("code"):
+            detail = body.decode("utf-8", errors="replace")
+            raise SystemExit(f"HTTP {response.status} {response.reason}: {detail}")
+        return error
+    return _json_loads(body)
+
+
+def _lock(handle: Any) -> None:
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+
+
+def _token_cache_path() -> str:
+    path = os.getenv("FEISHU_TOKEN_CACHE")
+    if path:
+        return path
+    # Never a shared, predictable location such as /tmp: the token is a live
+    # credential. RUNNER_TEMP is private to the runner user.
+    cache_dir = (
+        os.getenv("RUNNER_TEMP")
+        or os.getenv("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(cache_dir, "feishu_token.json")
+
+
+def _open_token_cache() -> int | None:
+    path = _token_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    except OSError:
+        return None
+    # Only trust a file this user owns and nobody else can read; anything else
+    # may have been planted to capture or inject a token.
+    if hasattr(os, "getuid"):
+        status = os.fstat(fd)
+        if status.st_uid != os.getuid() or status.st_mode & 0o077:
+            os.close(fd)
+            return None
+    return fd
+
+
+def _token_valid(expires_at: float) -> bool:
+    return time.time() < expires_at - TOKEN_EXPIRY_MARGIN
+
+
+def _read_cached_token(handle: Any, app_id: str) -> tuple[str, float] | None:
+    handle.seek(0)
     try:
-        with urlopen(request, timeout=30) as response:
-            body = response.read().decode("utf-8")
-    except HTTPError as error:
-        detail = error.read().decode("utf-8", errors="replace")
-        raise SystemExit(f"HTTP {error.code} {error.reason}: {detail}") from error
-    return json.loads(body)
+        cached = json.loads(handle.read() or "{}")
+    except ValueError:
+        return None
+    # Anything but the shape written below is treated as a cache miss.
+    if not isinstance(cached, dict) or cached.get("app_id") != app_id:
+        return None
+    token, expires_at = cached.get("token"), cached.get("expires_at")
+    if not isinstance(token, str) or not token or not isinstance(expires_at, (int, float)):
+        return None
+    if not _token_valid(expires_at):
+        return None
+    return token, expires_at
 
 
-def _get_tenant_token(base_url: str, app_id: str, app_secret: str) -> str:
-    url = f"{base_url}/open-apis/auth/v3/tenant_access_token/internal"
+def _fetch_tenant_token(base_url: str, app_id: str, app_secret: str) -> tuple[str, int]:
     response = _request_json(
         "POST",
-        url,
-        {"Content-Type": "application/json; charset=utf-8"},
+        TOKEN_URL.format(base_url=base_url),
+        _JSON_HEADERS,
         {"app_id": app_id, "app_secret": app_secret},
     )
     if response.get("code") != 0:
         raise SystemExit(f"Failed to get tenant token: {response}")
-    return response["tenant_access_token"]
+    return response["tenant_access_token"], int(response.get("expire", 0))
 
 
-def _bitable_search(
-    base_url: str,
-    token: str,
-    app_token: str,
-    table_id: str,
-    issue_id: int,
+def _get_tenant_token(base_url: str, app_id: str, app_secret: str) -> str:
+    if app_id in _TOKENS and _token_valid(_TOKENS[app_id][1]):
+        return _TOKENS[app_id][0]
+    # The token is valid for ~2 hours, so share it between invocations through a
+    # small cache file; the lock keeps concurrent runs from racing on refresh.
+    fd = _open_token_cache()
+    if fd is None:
+        token, expire = _fetch_tenant_token(base_url, app_id, app_secret)
+        _TOKENS[app_id] = (token, int(time.time()) + expire)
+        return token
+    with os.fdopen(fd, "r+", encoding="utf-8") as handle:
+        _lock(handle)
+        cached = _read_cached_token(handle, app_id)
+        if cached:
+            _TOKENS[app_id] = cached
+            return cached[0]
+        token, expire = _fetch_tenant_token(base_url, app_id, app_secret)
+        expires_at = int(time.time()) + expire
+        handle.seek(0)
+        handle.truncate()
+        json.dump({"app_id": app_id, "token": token, "expires_at": expires_at}, handle)
+    _TOKENS[app_id] = (token, expires_at)
+    return token
+
+
+@lru_cache(maxsize=4)
+def _auth_headers(token: str) -> dict[str, str]:
+    # Built once per token and shared by every Bitable request; never mutated.
+    return {**_JSON_HEADERS, "Authorization": f"Bearer {token}"}
+
+
+def _content_hash(fields: dict[str, Any]) -> str:
+    # Always hash the stdlib encoding so the digest does not depend on orjson.
+    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+# The record cache maps records_url -> issue_id -> {"hash", "record_id"}, so
+# pointing the script at another app, table or Feishu host starts from scratch
+# instead of reusing hashes and record IDs that describe a different table.
+def _load_record_cache(path: str | None, records_url: str) -> dict[str, dict[str, str]]:
+    if not path:
+        return {}
+    try:
+        with open(path, "rb") as handle:
+            cached = _json_loads(handle.read())
+    except (OSError, ValueError):
+        return {}
+    table = cached.get(records_url) if isinstance(cached, dict) else None
+    if not isinstance(table, dict):
+        return {}
+    # A damaged entry only costs that issue a search, not the whole run.
+    return {issue_id: entry for issue_id, entry in table.items() if isinstance(entry, dict)}
+
+
+def _save_record_cache(path: str, records_url: str, entries: dict[str, dict[str, str]]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    with os.fdopen(fd, "r+", encoding="utf-8") as handle:
+        # Merge into what is on disk now so parallel runs keep each other's entries.
+        _lock(handle)
+        try:
+            cached = json.loads(handle.read() or "{}")
+        except ValueError:
+            cached = {}
+        if not isinstance(cached, dict):
+            cached = {}
+        table = cached.get(records_url)
+        if not isinstance(table, dict):
+            table = cached[records_url] = {}
+        for issue_id, entry in entries.items():
+            if not isinstance(table.get(issue_id), dict):
+                table[issue_id] = {}
+            table[issue_id].update(entry)
+        handle.seek(0)
+        handle.truncate()
+        json.dump(cached, handle, ensure_ascii=False)
+
+
+def _field_text(value: Any) -> str:
+    # Text cells come back from search as a list of rich-text segments.
+    if isinstance(value, list):
+        return "".join(segment.get("text", "") for segment in value if isinstance(segment, dict))
+    return str(value)
+
+
+def _bitable_search_chunk(
+    records_url: str,
+    headers: dict[str, str],
+    issue_ids: list[str],
     field_name: str,
-) -> str | None:
-    url = f"{base_url}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/search"
+) -> dict[str, str]:
+    # Only the record_id is needed, so ask Feishu not to send back the row contents.
     payload = {
+        "field_names": [field_name],
+        "automatic_fields": False,
         "filter": {
-            "conjunction": "and",
+            "conjunction": "or",
             "conditions": [
                 {
                     "field_name": field_name,
                     "operator": "is",
-                    "value": [str(issue_id)],
+                    "value": [issue_id],
                 }
+                for issue_id in issue_ids
             ],
         },
-        "page_size": 1,
     }
-    response = _request_json(
-        "POST",
-        url,
-        {
-            "Content-Type": "application/json; charset=utf-8",
-            "Authorization": f"Bearer {token}",
-        },
-        payload,
-    )
-    if response.get("code") != 0:
-        raise SystemExit(f"Failed to search bitable records: {response}")
-    items = response.get("data", {}).get("items", [])
-    if not items:
-        return None
-    return items[0].get("record_id")
+    record_ids: dict[str, str] = {}
+    query = {"page_size": BATCH_SIZE}
+    # Duplicate rows can push matches past the first page; an issue missed here
+    # would be treated as new and get yet another row.
+    while True:
+        url = f"{records_url}/search?{urlencode(query)}"
+        response = _request_json("POST", url, headers, payload)
+        if response.get("code") != 0:
+            raise SystemExit(f"Failed to search bitable records: {response}")
+        data = response.get("data") or {}
+        for item in data.get("items") or []:
+            issue_id = _field_text(item.get("fields", {}).get(field_name))
+            record_ids.setdefault(issue_id, item.get("record_id"))
+        if not data.get("has_more"):
+            return record_ids
+        if not data.get("page_token"):
+            raise SystemExit(f"Bitable search has more results but no page_token: {response}")
+        query["page_token"] = data["page_token"]
 
 
-def _bitable_upsert(
-    base_url: str,
-    token: str,
-    app_token: str,
-    table_id: str,
-    issue_id: int,
+def _bitable_search(
+    records_url: str,
+    headers: dict[str, str],
+    issue_ids: list[str],
     field_name: str,
-    fields: dict[str, Any],
-) -> None:
-    record_id = _bitable_search(base_url, token, app_token, table_id, issue_id, field_name)
-    if record_id:
-        url = f"{base_url}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records/{record_id}"
-        method = "PUT"
-    else:
-        url = f"{base_url}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records"
-        method = "POST"
+) -> dict[str, str]:
+    record_ids: dict[str, str] = {}
+    for chunk_record_ids in _gather(
+        [
+            lambda chunk=chunk: _bitable_search_chunk(records_url, headers, chunk, field_name)
+            for chunk in _chunks(issue_ids, SEARCH_BATCH_SIZE)
+        ]
+    ):
+        record_ids.update(chunk_record_ids)
+    return record_ids
+
+
+def _bitable_batch_update(
+    records_url: str,
+    headers: dict[str, str],
+    records: list[dict[str, Any]],
+) -> bool:
+    url = f"{records_url}/batch_update"
     response = _request_json(
-        method,
+        "POST",
         url,
-        {
-            "Content-Type": "application/json; charset=utf-8",
-            "Authorization": f"Bearer {token}",
-        },
-        {"fields": fields},
+        headers,
+        {"records": records},
     )
+    if response.get("code") == RECORD_ID_NOT_FOUND:
+        return False
     if response.get("code") != 0:
         raise SystemExit(f"Failed to upsert bitable record: {response}")
+    return True
 
 
-def _bitable_create(
-    base_url: str,
-    token: str,
-    app_token: str,
-    table_id: str,
-    fields: dict[str, Any],
-) -> None:
-    url = f"{base_url}/open-apis/bitable/v1/apps/{app_token}/tables/{table_id}/records"
+def _bitable_batch_create(
+    records_url: str,
+    headers: dict[str, str],
+    records: list[dict[str, Any]],
+) -> list[str]:
+    url = f"{records_url}/batch_create"
     response = _request_json(
         "POST",
         url,
-        {
-            "Content-Type": "application/json; charset=utf-8",
-            "Authorization": f"Bearer {token}",
-        },
-        {"fields": fields},
+        headers,
+        {"records": [{"fields": fields} for fields in records]},
     )
     if response.get("code") != 0:
         raise SystemExit(f"Failed to create bitable record: {response}")
+    return [record.get("record_id") for record in response.get("data", {}).get("records") or []]
 
 
-def _truncate(value: str | None, limit: int) -> str | None:
-    if value is None:
-        return None
-    if len(value) <= limit:
-        return value
-    return value[: limit - 3] + "..."
+def _bitable_upsert(
+    records_url: str,
+    headers: dict[str, str],
+    field_name: str,
+    records: dict[str, dict[str, Any]],
+    known_record_ids: dict[str, str],
+) -> dict[str, str]:
+    # Issues whose record_id is already known are updated directly; only the
+    # rest need a search round-trip first.
+    record_ids = {
+        issue_id: known_record_ids[issue_id] for issue_id in records if issue_id in known_record_ids
+    }
+    unknown = [issue_id for issue_id in records if issue_id not in record_ids]
+    if unknown:
+        record_ids.update(_bitable_search(records_url, headers, unknown, field_name))
+    existing = [issue_id for issue_id in records if issue_id in record_ids]
+    new = [issue_id for issue_id in records if issue_id not in record_ids]
 
+    # Bitable rejects concurrent writes to one table, so unlike the searches the
+    # write chunks go out one after another.
+    written: dict[str, str] = {}
+    stale: list[str] = []
+    for chunk in _chunks(existing, BATCH_SIZE):
+        updates = [
+            {"record_id": record_ids[issue_id], "fields": records[issue_id]} for issue_id in chunk
+        ]
+        if _bitable_batch_update(records_url, headers, updates):
+            written.update((issue_id, record_ids[issue_id]) for issue_id in chunk)
+        else:
+            stale.extend(chunk)
+    for chunk in _chunks(new, BATCH_SIZE):
+        created_ids = _bitable_batch_create(
+            records_url, headers, [records[issue_id] for issue_id in chunk]
+        )
+        written.update(zip(chunk, created_ids))
+    if stale:
+        if not known_record_ids:
+            raise SystemExit(f"Failed to upsert bitable record: record not found for {stale}")
+        # A remembered record was deleted from the table; look these issues up
+        # again and recreate them if they are really gone.
+        written.update(
+            _bitable_upsert(
+                records_url,
+                headers,
+                field_name,
+                {issue_id: records[issue_id] for issue_id in stale},
+                {},
+            )
+        )
+    return written
 
-def main() -> None:
-    event_path = _env("GITHUB_EVENT_PATH")
-    base_url = os.getenv("FEISHU_BASE_URL") or "https://open.feishu.cn"
-    app_id = _env("FEISHU_APP_ID")
-    app_secret = _env("FEISHU_APP_SECRET")
-    app_token = _env("FEISHU_APP_TOKEN")
-    table_id = _env("FEISHU_TABLE_ID")
-    upsert = (os.getenv("FEISHU_UPSERT") or "1") == "1"
-    issue_id_field = os.getenv("FEISHU_FIELD_ISSUE_ID") or "Issue ID"
-    ai_summary = os.getenv("ISSUE_AI_SUMMARY")
 
-    event = _load_event(event_path)
-    if "issue" not in event:
-        raise SystemExit("Event payload missing 'issue'")
+def _bitable_create(
+    records_url: str,
+    headers: dict[str, str],
+    records: list[dict[str, Any]],
+) -> None:
+    for chunk in _chunks(records, BATCH_SIZE):
+        _bitable_batch_create(records_url, headers, chunk)
 
-    issue = event["issue"]
-    action = event.get("action", "unknown")
 
-    labels = [label.get("name") for label in issue.get("labels", []) if label.get("name")]
-    assignees = [
-        assignee.get("login")
-        for assignee in issue.get("assignees", [])
-        if assignee.get("login")
-    ]
+def _truncate(value: str | None, limit: int) -> str | None:
+    if value is None:
+        return None
+    # Feishu counts the limit in UTF-8 bytes; a character is at most 4 bytes, so
+    # short values can skip the encode entirely.
+    if len(value) * 4 <= limit:
+        return value
+    encoded = value.encode("utf-8")
+    if len(encoded) <= limit:
+        return value
+    # Cutting mid-character leaves a partial sequence that decoding drops.
+    return encoded[: limit - 3].decode("utf-8", errors="ignore") + "..."
 
+
+def _build_fields(
+    issue: IssueFields, issue_id_field: str, ai_summary: str | None
+) -> dict[str, Any]:
+    raw_labels = issue.get("labels")
+    labels = ", ".join(
+        name
+        for label in (raw_labels if isinstance(raw_labels, list) else ())
+        if isinstance(label, dict) and isinstance(name := label.get("name"), str) and name
+    )
     fields = {
         issue_id_field: str(issue.get("id")),
         "Issue Number": issue.get("number"),
         "Title": issue.get("title"),
-        "AI Summary": _truncate(ai_summary, 1000),
         "State": issue.get("state"),
         "URL": issue.get("html_url"),
-        "Labels": ", ".join(labels) if labels else None,
+        "Labels": labels or None,
         "Created At": _parse_github_timestamp(issue.get("created_at")),
         "Updated At": _parse_github_timestamp(issue.get("updated_at")),
         "Closed At": _parse_github_timestamp(issue.get("closed_at")),
     }
+    # Without a summary the key is left out, so an update keeps the one already
+    # stored in the row instead of clearing it.
+    if ai_summary is not None:
+        fields["AI Summary"] = _truncate(ai_summary, 1000)
+    return fields
 
-    token = _get_tenant_token(base_url, app_id, app_secret)
-    if upsert:
-        _bitable_upsert(
-            base_url, token, app_token, table_id, issue.get("id"), issue_id_field, fields
-        )
-    else:
-        _bitable_create(base_url, token, app_token, table_id, fields)
+
+def main() -> None:
+    stream_path = os.getenv("GITHUB_EVENTS_STREAM")
+    event_paths = [] if stream_path else _event_paths()
+    base_url = os.getenv("FEISHU_BASE_URL") or "https://open.feishu.cn"
+    app_id = _env("FEISHU_APP_ID")
+    app_secret = _env("FEISHU_APP_SECRET")
+    records_url = RECORDS_URL.format(
+        base_url=base_url,
+        app_token=_env("FEISHU_APP_TOKEN"),
+        table_id=_env("FEISHU_TABLE_ID"),
+    )
+    upsert = (os.getenv("FEISHU_UPSERT") or "1") == "1"
+    issue_id_field = os.getenv("FEISHU_FIELD_ISSUE_ID") or "Issue ID"
+    record_cache_path = os.getenv("FEISHU_RECORD_CACHE")
+    skip_unchanged = os.getenv("FEISHU_SKIP_UNCHANGED") == "1"
+    # The summary describes a single issue, so it only applies to single-event runs.
+    ai_summary = os.getenv("ISSUE_AI_SUMMARY") if len(event_paths) == 1 else None
+
+    # The token request does not depend on the events, so fetch it while they parse.
+    token_future = _executor().submit(_get_tenant_token, base_url, app_id, app_secret)
+
+    def sync(token: str, records: list[dict[str, Any]]) -> None:
+        if upsert:
+            # Later events for the same issue replace earlier ones.
+            latest = {fields[issue_id_field]: fields for fields in records}
+            cache = _load_record_cache(record_cache_path, records_url)
+            hashes = {issue_id: _content_hash(fields) for issue_id, fields in latest.items()}
+            # Skipping rows whose hash matches the last write recorded in the cache
+            # is only sound when every write to the table goes through this cache
+            # file, in order. It cannot see manual edits or deletions in Feishu,
+            # writes by other jobs or workflows, or writes recorded in a cache
+            # copy that was not the one restored; an unchanged event will then
+            # not repair the row. Hence it is opt-in.
+            changed = {
+                issue_id: fields
+                for issue_id, fields in latest.items()
+                if not skip_unchanged or cache.get(issue_id, {}).get("hash") != hashes[issue_id]
+            }
+            if not changed:
+                return
+            record_ids = _bitable_upsert(
+                records_url,
+                _auth_headers(token),
+                issue_id_field,
+                changed,
+                {
+                    issue_id: entry["record_id"]
+                    for issue_id, entry in cache.items()
+                    if isinstance(entry.get("record_id"), str) and entry["record_id"]
+                },
+            )
+            if record_cache_path:
+                _save_record_cache(
+                    record_cache_path,
+                    records_url,
+                    {
+                        issue_id: {"hash": hashes[issue_id], "record_id": record_id}
+                        for issue_id, record_id in record_ids.items()
+                    },
+                )
+        else:
+            _bitable_create(records_url, _auth_headers(token), records)
+
+    if stream_path:
+        from http.client import HTTPException
+
+        # Keep going after a bad event; the token and the open connections are
+        # reused for every line, which is what makes the consumer worth running.
+        token_future.result()
+        for line_number, line in _stream_lines(stream_path):
+            source = f"{stream_path}:{line_number}"
+            try:
+                issue = _extract_issue(_json_loads(line), source)
+                fields = _build_fields(issue, issue_id_field, None)
+            except (SystemExit, ValueError) as error:
+                print(f"Skipping malformed event {source}: {error}", file=sys.stderr)
+                continue
+            try:
+                sync(_get_tenant_token(base_url, app_id, app_secret), [fields])
+            except (SystemExit, OSError, HTTPException) as error:
+                print(f"Failed to sync event {source}: {error}", file=sys.stderr)
+        return
+
+    records = [
+        _build_fields(_load_issue(event_path), issue_id_field, ai_summary)
+        for event_path in event_paths
+    ]
+    sync(token_future.result(), records)
 
 
 if __name__ == "__main__":
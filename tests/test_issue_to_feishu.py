@@ -0,0 +1,271 @@
+"""Tests for script/issue_to_feishu.py."""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from typing import Any
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "script"))
+
+import issue_to_feishu  # noqa: E402
+
+
+def _event(issue_id: int) -> bytes:
+    issue = {"id": issue_id, "number": issue_id, "title": f"Issue {issue_id}", "labels": []}
+    return json.dumps({"action": "opened", "issue": issue}).encode("utf-8") + b"\n"
+
+
+class StreamConsumerTest(unittest.TestCase):
+    def _consume(self, lines: list[bytes]) -> tuple[dict[str, dict], str]:
+        synced: dict[str, dict] = {}
+
+        def upsert(records_url, headers, field_name, records, known_record_ids):
+            synced.update(records)
+            return {}
+
+        env = {
+            "GITHUB_EVENTS_STREAM": "-",
+            "FEISHU_APP_ID": "app",
+            "FEISHU_APP_SECRET": "secret",
+            "FEISHU_APP_TOKEN": "app-token",
+            "FEISHU_TABLE_ID": "table",
+        }
+        stdin = mock.Mock(buffer=io.BytesIO(b"".join(lines)))
+        stderr = io.StringIO()
+        with mock.patch.dict(os.environ, env, clear=True), mock.patch.multiple(
+            issue_to_feishu,
+            _get_tenant_token=mock.Mock(return_value="token"),
+            _bitable_upsert=upsert,
+        ), mock.patch.object(sys, "stdin", stdin), mock.patch.object(sys, "stderr", stderr):
+            issue_to_feishu.main()
+        return synced, stderr.getvalue()
+
+    def test_malformed_line_is_skipped_and_reported(self) -> None:
+        for bad_line in (
+            b'{"issue": null}\n',
+            b"123\n",
+            b'"an issue"\n',
+            b"not json\n",
+        ):
+            with self.subTest(bad_line=bad_line):
+                synced, errors = self._consume([_event(1), bad_line, _event(2)])
+                self.assertEqual(list(synced), ["1", "2"])
+                self.assertIn("-:2", errors)
+
+    def test_malformed_fields_still_sync(self) -> None:
+        for issue in (
+            {"id": 9, "labels": ["x"]},
+            {"id": 9, "labels": [{"name": ["a"]}]},
+            {"id": 9, "labels": "bug"},
+            {"id": 9, "created_at": 5},
+            {"id": 9, "created_at": ["x"]},
+            {"id": 9, "created_at": "yesterday"},
+            {"id": 9, "title": {"text": "x"}},
+        ):
+            with self.subTest(issue=issue):
+                bad_line = json.dumps({"issue": issue}).encode("utf-8") + b"\n"
+                synced, errors = self._consume([_event(1), bad_line, _event(2)])
+                self.assertEqual(list(synced), ["1", "9", "2"])
+                self.assertEqual(errors, "")
+                fields = synced["9"]
+                self.assertIsNone(fields["Labels"])
+                self.assertIsNone(fields["Created At"])
+                self.assertIsNone(fields["Title"])
+
+    def test_labels_and_timestamps_are_converted(self) -> None:
+        issue = {
+            "id": 9,
+            "labels": [{"name": "bug"}, {"name": 3}, {"name": "zha"}],
+            "created_at": "2024-01-02T03:04:05Z",
+        }
+        synced, _ = self._consume([json.dumps({"issue": issue}).encode("utf-8") + b"\n"])
+        self.assertEqual(synced["9"]["Labels"], "bug, zha")
+        self.assertEqual(synced["9"]["Created At"], 1704164645000)
+
+    def test_missing_summary_is_not_sent(self) -> None:
+        synced, _ = self._consume([_event(1)])
+        self.assertNotIn("AI Summary", synced["1"])
+
+
+
+class TokenCacheTest(unittest.TestCase):
+    def test_unexpected_cache_content_is_a_miss(self) -> None:
+        for content in (
+            "[]",
+            "null",
+            '"token"',
+            '{"app_id": "app", "token": "t", "expires_at": "soon"}',
+            '{"app_id": "app", "token": ["t"], "expires_at": 9999999999}',
+            '{"app_id": "app", "token": "t"}',
+            "{",
+        ):
+            with self.subTest(content=content):
+                self.assertIsNone(issue_to_feishu._read_cached_token(io.StringIO(content), "app"))
+
+    def test_valid_cache_entry_is_a_hit(self) -> None:
+        content = json.dumps({"app_id": "app", "token": "t", "expires_at": 9999999999})
+        self.assertEqual(
+            issue_to_feishu._read_cached_token(io.StringIO(content), "app"), ("t", 9999999999)
+        )
+
+
+class RecordCacheTest(unittest.TestCase):
+    URL = "https://feishu/records"
+
+    def _path(self, content: str) -> str:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "records.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        return path
+
+    def test_unexpected_shapes_are_ignored(self) -> None:
+        for content in (
+            "[]",
+            json.dumps({self.URL: []}),
+            json.dumps({self.URL: {"1": "rec1", "2": None, "3": {"record_id": "rec3"}}}),
+        ):
+            with self.subTest(content=content):
+                path = self._path(content)
+                loaded = issue_to_feishu._load_record_cache(path, self.URL)
+                self.assertEqual(list(loaded), ["3"] if "rec3" in content else [])
+                issue_to_feishu._save_record_cache(
+                    path, self.URL, {"1": {"hash": "h", "record_id": "rec9"}}
+                )
+                loaded = issue_to_feishu._load_record_cache(path, self.URL)
+                self.assertEqual(loaded["1"], {"hash": "h", "record_id": "rec9"})
+
+
+class FakeBitable:
+    """Stands in for _request_json with an in-memory table keyed by record_id."""
+
+    def __init__(self, rows: dict[str, str], page_limit: int = 500) -> None:
+        self.rows = dict(rows)
+        self.page_limit = page_limit
+        self.calls: list[tuple[str, Any]] = []
+        self._created = 0
+
+    def __call__(self, method: str, url: str, headers: dict[str, str], payload: Any) -> dict:
+        parts = urlsplit(url)
+        action = parts.path.rsplit("/", 1)[-1]
+        self.calls.append((action, payload))
+        if action == "search":
+            wanted = {condition["value"][0] for condition in payload["filter"]["conditions"]}
+            matches = [
+                {"record_id": record_id, "fields": {"Issue ID": [{"text": issue_id}]}}
+                for record_id, issue_id in self.rows.items()
+                if issue_id in wanted
+            ]
+            start = int(parse_qs(parts.query).get("page_token", ["0"])[0])
+            end = start + self.page_limit
+            data = {"items": matches[start:end], "has_more": end < len(matches)}
+            if data["has_more"]:
+                data["page_token"] = str(end)
+            return {"code": 0, "data": data}
+        if action == "batch_update":
+            if any(record["record_id"] not in self.rows for record in payload["records"]):
+                return {"code": issue_to_feishu.RECORD_ID_NOT_FOUND, "msg": "RecordIdNotFound"}
+            return {"code": 0, "data": {"records": payload["records"]}}
+        if action == "batch_create":
+            records = []
+            for record in payload["records"]:
+                self._created += 1
+                record_id = f"new{self._created}"
+                self.rows[record_id] = record["fields"]["Issue ID"]
+                records.append({"record_id": record_id, "fields": record["fields"]})
+            return {"code": 0, "data": {"records": records}}
+        raise AssertionError(f"unexpected request {method} {url}")
+
+    def actions(self) -> list[str]:
+        return [action for action, _ in self.calls]
+
+    def searched(self) -> list[list[str]]:
+        return [
+            [condition["value"][0] for condition in payload["filter"]["conditions"]]
+            for action, payload in self.calls
+            if action == "search"
+        ]
+
+
+class BitableUpsertTest(unittest.TestCase):
+    URL = "https://feishu/open-apis/bitable/v1/apps/app/tables/table/records"
+
+    def _upsert(self, bitable: FakeBitable, issue_ids: list[str], known: dict[str, str]) -> dict:
+        records = {issue_id: {"Issue ID": issue_id} for issue_id in issue_ids}
+        with mock.patch.object(issue_to_feishu, "_request_json", bitable):
+            return issue_to_feishu._bitable_upsert(self.URL, {}, "Issue ID", records, known)
+
+    def test_only_unknown_record_ids_are_searched(self) -> None:
+        bitable = FakeBitable({"rec1": "1", "rec2": "2"})
+        written = self._upsert(bitable, ["1", "2", "3"], {"1": "rec1"})
+        self.assertEqual(bitable.searched(), [["2", "3"]])
+        self.assertEqual(bitable.actions(), ["search", "batch_update", "batch_create"])
+        self.assertEqual(written, {"1": "rec1", "2": "rec2", "3": "new1"})
+
+    def test_stale_record_id_is_searched_again_and_updated(self) -> None:
+        bitable = FakeBitable({"rec1": "1"})
+        written = self._upsert(bitable, ["1"], {"1": "deleted"})
+        self.assertEqual(bitable.actions(), ["batch_update", "search", "batch_update"])
+        self.assertEqual(written, {"1": "rec1"})
+
+    def test_stale_record_id_is_recreated_when_the_row_is_gone(self) -> None:
+        bitable = FakeBitable({})
+        written = self._upsert(bitable, ["1"], {"1": "deleted"})
+        self.assertEqual(bitable.actions(), ["batch_update", "search", "batch_create"])
+        self.assertEqual(written, {"1": "new1"})
+
+    def test_search_follows_pages(self) -> None:
+        bitable = FakeBitable({"rec1": "1", "dup1": "1", "rec2": "2", "rec3": "3"}, page_limit=1)
+        written = self._upsert(bitable, ["1", "2", "3"], {})
+        self.assertEqual(bitable.actions(), ["search"] * 4 + ["batch_update"])
+        # The first row found wins when an issue has duplicate rows.
+        self.assertEqual(written, {"1": "rec1", "2": "rec2", "3": "rec3"})
+
+    def test_search_without_page_token_fails(self) -> None:
+        bitable = mock.Mock(return_value={"code": 0, "data": {"items": [], "has_more": True}})
+        with self.assertRaises(SystemExit):
+            self._upsert(bitable, ["1"], {})
+
+    def test_created_record_ids_are_cached_for_the_next_run(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        event_path = os.path.join(directory.name, "event.json")
+        with open(event_path, "wb") as handle:
+            handle.write(_event(1))
+        cache_path = os.path.join(directory.name, "cache", "records.json")
+        env = {
+            "GITHUB_EVENT_PATH": event_path,
+            "FEISHU_BASE_URL": "https://feishu",
+            "FEISHU_APP_ID": "app",
+            "FEISHU_APP_SECRET": "secret",
+            "FEISHU_APP_TOKEN": "app",
+            "FEISHU_TABLE_ID": "table",
+            "FEISHU_RECORD_CACHE": cache_path,
+        }
+        bitable = FakeBitable({})
+        with mock.patch.dict(os.environ, env, clear=True), mock.patch.multiple(
+            issue_to_feishu,
+            _get_tenant_token=mock.Mock(return_value="token"),
+            _request_json=bitable,
+        ), mock.patch.object(sys, "stdout", io.StringIO()):
+            issue_to_feishu.main()
+            self.assertEqual(bitable.actions(), ["search", "batch_create"])
+            cached = issue_to_feishu._load_record_cache(cache_path, self.URL)
+            self.assertEqual(cached["1"]["record_id"], "new1")
+
+            bitable.calls.clear()
+            issue_to_feishu.main()
+            self.assertEqual(bitable.actions(), ["batch_update"])
+            self.assertEqual(bitable.calls[0][1]["records"][0]["record_id"], "new1")
+
+
+if __name__ == "__main__":
+    unittest.main()